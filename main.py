@@ -72,104 +72,248 @@ Example:
         * Scraper directly with CAS-numbers
 """
 
-import PyPDF2
-from os import listdir
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+import io
+import json
+from itertools import chain
+import os
 import re
+import sys
+
+# PyMuPDF is preferred for speed, pypdf is used as a pure Python fallback
+PdfReader = None
+try:
+    import fitz
+except ImportError:
+    fitz = None
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        pass
 
 # Define red flags
-redFlags = ["H340", "H341", "H350", "H350i", "H360", "H360D", "H360Df", "H360F", "H360FD", "H360Fd", "H361", "H361d", "H361df", "H362", "H370", "H371", "H372", "H373", "H300", "H301", "H310", "H311", "H330", "H331", "UEH001", "EUH006", "EUH019", "EUH029", "EUH031", "EUH32", "EUH044", "EUH070", "EUH071"]
-cmrFilter = ["H340", "H350", "H341", "H350", "H350i", "H351", "H360", "H360D", "H360Df", "H360F", "H360FD", "H360Fd", "H361", "H361d", "H361f", "H361fd", "H362", "H370", "H371", "H372", "H373"]
-otherFilter = ["H300", "H301", "H310", "H311", "H330", "H331", "EUH001", "EUH006", "EUH019", "EUH029", "EUH031", "EUH032", "EUH044", "EUH070", "EUH071"]
-
-# Extract text using regexp
-def extract_text(text, pattern):
-    pattern = pattern
-    match = re.search(pattern, text, re.DOTALL)
-    if match:
-        extracted_text = match.group(1).strip()
-        return extracted_text
-    else:
+redFlags = ["H340", "H341", "H350", "H350i", "H351", "H360", "H360D", "H360Df", "H360F", "H360FD", "H360Fd", "H361", "H361d", "H361f", "H361fd", "H362", "H370", "H371", "H372", "H373", "H300", "H301", "H310", "H311", "H330", "H331", "EUH001", "EUH006", "EUH019", "EUH029", "EUH031", "EUH032", "EUH044", "EUH070", "EUH071"]
+cmrFilter = frozenset({"H340", "H341", "H350", "H350i", "H351", "H360", "H360D", "H360Df", "H360F", "H360FD", "H360Fd", "H361", "H361d", "H361f", "H361fd", "H362", "H370", "H371", "H372", "H373"})
+otherFilter = frozenset({"H300", "H301", "H310", "H311", "H330", "H331", "EUH001", "EUH006", "EUH019", "EUH029", "EUH031", "EUH032", "EUH044", "EUH070", "EUH071"})
+
+# Results of earlier runs are kept in this file in the MSDS directory
+cacheFile = ".msds_cache.json"
+
+# Increase this whenever the text extraction or matching changes, so results of older versions are not reused
+cacheVersion = 2
+
+# Build a regexp from a trie of the words, so shared prefixes such as H36 are matched only once per position
+def trie_pattern(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        endsHere = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not endsHere:
+            return branches[0]
+
+        # A greedy optional group tries the longer words first
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if endsHere else group
+
+    return build(trie)
+
+# Match all red flags in a single pass, the greedy trie takes the longest flag so that e.g. H350i is not also reported as H350
+# The pages are matched as ASCII bytes, which is faster than matching non-ASCII str
+redFlagRegex = re.compile(trie_pattern(redFlags).encode("ascii"))
+
+# Every red flag starts with one of these (letters up to the first digit), pages without any of them cannot match
+redFlagPrefixes = tuple(sorted({re.match(r"\D*\d", flag).group().encode("ascii") for flag in redFlags}))
+
+# Extract the text between the first start anchor and the end anchor following it
+def extract_text(text, start, end):
+    startIndex = text.find(start)
+    if startIndex < 0:
         return None
 
-# Check for all pdfs in the current directory
-allFiles = listdir()
-allFiles = [i for i in allFiles if '.pdf' in i]
-totalNumberOfFiles = len(allFiles)
-
-# Print the initialization text
-print("ETOS group A!lto MSDS scaper")
-print("{} MSDS files found in the directory".format(totalNumberOfFiles))
-print()
-
+    startIndex += len(start)
+    endIndex = text.find(end, startIndex)
+    if endIndex < 0:
+        return None
 
+    return text[startIndex:endIndex].strip()
 
-# Go through all the files
-for index,f in enumerate(allFiles):
-    print("File: " + f + " (" + str(index+1) + "/" + str(totalNumberOfFiles) + ")")
-    print("--------------------------------")
-    # Read the file
-    pdfFile = open(f, 'rb')
-    pdfReader = PyPDF2.PdfFileReader(pdfFile)
-    documentPagesMax = pdfReader.numPages
+# Collect the compound name and CAS number from the first page
+def extract_first_page_info(pageText):
+    firstPage = pageText.replace('\n', '')
 
-    # Collect the compound name and CAS number from the first page
-    pageObj = pdfReader.getPage(0)
-    firstPage = pageObj.extractText().replace('\n', '')
+    # Check to find a name and a CAS No for the chemical, this assumes Sigma-Aldrich style MSDS
+    name = extract_text(firstPage, "Product name", "Product Number")
+    cas = extract_text(firstPage, "CAS-No.", "1.2")
 
-    # Check to find a name for the chemical, this assumes Sigma-Aldrich style MSDS
-    name = extract_text(firstPage, r"Product name(.*?)Product Number")
+    return name, cas
 
+# Extract the page texts lazily, a page is only read when the consumer asks for it
+def page_texts(pdfData):
+    if fitz:
+        with fitz.open(stream=pdfData, filetype="pdf") as doc:
+            for page in doc:
+                yield page.get_text("text")
+    else:
+        # reader.pages walks the page tree once instead of on every page access
+        reader = PdfReader(io.BytesIO(pdfData))
+        for page in reader.pages:
+            yield page.extract_text()
+
+# Go through the page texts one at a time and yield the red flags appearing on each page
+def find_page_statements(pageTexts):
+    for pageText in pageTexts:
+        # Convert the page once, non-ASCII characters become '?' so no characters around them are joined
+        pageBytes = pageText.encode("ascii", "replace")
+
+        # Cheap substring check before running the full regex on the page
+        if not any(prefix in pageBytes for prefix in redFlagPrefixes):
+            continue
+
+        yield {statement.decode("ascii") for statement in redFlagRegex.findall(pageBytes)}
+
+# Collect the red flags appearing in the document
+def extract_hazard_statements(pageTexts):
+    # This set contains the red flags found so far
+    found = set()
+
+    for hits in find_page_statements(pageTexts):
+        found |= hits
+
+    return sorted(found)
+
+# Read a single MSDS file, this runs in a worker process
+def process_file(f):
+    # Read the whole file into memory once and parse it from there
+    with open(f, 'rb') as pdfFile:
+        pdfData = pdfFile.read()
+
+    # Extract the text of each page only once, the first page is shared by both lookups
+    with closing(page_texts(pdfData)) as pageTexts:
+        firstPage = next(pageTexts, "")
+
+        name, cas = extract_first_page_info(firstPage)
+        statements = extract_hazard_statements(chain([firstPage], pageTexts))
+
+    return {"file": f, "name": name, "cas": cas, "statements": statements}
+
+# Identify a file by its name, size and modification time, a change in any of them invalidates its cached result
+def file_cache_key(f):
+    stat = os.stat(f)
+    return "{}:{}:{}".format(f, stat.st_size, stat.st_mtime_ns)
+
+# The header of the cache, results are only reused if it matches the current run
+def cache_header():
+    return {"version": cacheVersion, "backend": "pymupdf" if fitz else "pypdf", "redFlags": redFlags}
+
+# Load the results of earlier runs, the cache is discarded if it was written by another version, backend or list of red flags
+def load_cache():
+    try:
+        with open(cacheFile, 'r', encoding='utf-8') as cache:
+            data = json.load(cache)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        return {}
+
+    if any(data.get(key) != value for key, value in cache_header().items()):
+        return {}
+
+    return data["files"]
+
+# Store the results of this run for the next one
+def save_cache(files):
+    try:
+        with open(cacheFile, 'w', encoding='utf-8') as cache:
+            json.dump(dict(cache_header(), files=files), cache)
+    except OSError:
+        pass
+
+# Print the results for a single MSDS file with a single write
+def print_result(index, totalNumberOfFiles, result):
+    lines = ["File: " + result["file"] + " (" + str(index+1) + "/" + str(totalNumberOfFiles) + ")"]
+    lines.append("--------------------------------")
+
+    # Compound name
+    name = result["name"]
     if name:
-        print("Compound name" + name)
+        lines.append("Compound name" + name)
     else:
-        print("Compound name: NOT FOUND IN MSDS")
-
-    # Check to find a CAS No for the chemical, this assumes Sigma-Aldrich style MSDS
-    cas = extract_text(firstPage, r"CAS-No.(.*?)1.2")
+        lines.append("Compound name: NOT FOUND IN MSDS")
 
+    # Compound CAS number
+    cas = result["cas"]
     if cas:
-        print("Compound CAS" + cas)
+        lines.append("Compound CAS" + cas)
     else:
-        print("Compound CAS: NOT FOUND IN MSDS")
-    
-    # This list will contain all the red flag hazard statements
-    statements = []
-
-    # Go through the document and check for red flags appearing on each page
-    for pageIndex in range(0, documentPagesMax):
-        pageObj = pdfReader.getPage(pageIndex)
-        pageText = pageObj.extractText()
-
-        # Add to results if a new red flag statement was found
-        results = [statement for statement in redFlags if statement in pageText and statement not in statements]
-
-        # Append any new ones to the masterlist
-        if results:
-            statements = statements + results
+        lines.append("Compound CAS: NOT FOUND IN MSDS")
 
     # Particularily hazardous substance (Yes/No)
+    statements = result["statements"]
     if statements:
-        print("Particularily hazardous: Yes")
+        lines.append("Particularily hazardous: Yes")
     else:
-        print("Particularily hazardous: No")
+        lines.append("Particularily hazardous: No")
 
     # Filter out CMR chemical (Yes/No, which statements)
-    cmrStatements = [i for i in statements if i in cmrFilter]
+    cmrStatements = sorted(cmrFilter.intersection(statements))
 
     if cmrStatements:
-        print("CMR chemical: Yes")
-        print("CMR H-phrases: ", end="")
-        print(*cmrStatements, sep=", ")
+        lines.append("CMR chemical: Yes")
+        lines.append("CMR H-phrases: " + ", ".join(cmrStatements))
     else:
-        print("CMR chemical: No")
+        lines.append("CMR chemical: No")
 
     # Filter out other statements with major risks (Yes/No, which statements)
-    otherStatements = [i for i in statements if i in otherFilter]
+    otherStatements = sorted(otherFilter.intersection(statements))
 
     if otherStatements:
-        print("Other H and EU Phrases chemical: ", end="")
-        print(*otherStatements, sep=", ")
+        lines.append("Other H and EU Phrases chemical: " + ", ".join(otherStatements))
     else:
-        print("Other H and EU Phrases: No")
-    
+        lines.append("Other H and EU Phrases: No")
+
+    sys.stdout.write("\n".join(lines) + "\n\n")
+
+if __name__ == "__main__":
+    if not fitz and not PdfReader:
+        sys.exit("No PDF library found, install PyMuPDF: pip install pymupdf (or pypdf)")
+
+    # Check for all pdfs in the current directory
+    with os.scandir() as entries:
+        allFiles = [i.name for i in entries if i.is_file() and i.name.lower().endswith('.pdf')]
+    totalNumberOfFiles = len(allFiles)
+
+    # Print the initialization text
+    print("ETOS group A!lto MSDS scaper")
+    print("{} MSDS files found in the directory".format(totalNumberOfFiles))
     print()
+
+    # Only parse the files that have changed since the previous run
+    cache = load_cache()
+    newCache = {}
+    cacheKeys = [file_cache_key(f) for f in allFiles]
+    changedFiles = [f for f, key in zip(allFiles, cacheKeys) if key not in cache]
+
+    # Go through the changed files in parallel, map keeps the results in the original file order
+    with ProcessPoolExecutor() as executor:
+        parsedResults = executor.map(process_file, changedFiles, chunksize=4)
+
+        for index, key in enumerate(cacheKeys):
+            if key in cache:
+                result = cache[key]
+            else:
+                result = next(parsedResults)
+
+            newCache[key] = result
+            print_result(index, totalNumberOfFiles, result)
+
+    save_cache(newCache)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Checks for the red flag matching in main.py, run with:
+
+    $ python3 -m unittest
+"""
+
+import unittest
+
+from main import cmrFilter, extract_hazard_statements, otherFilter, redFlags
+
+# The red flags and the substring matching of the original script
+baselineRedFlags = ["H340", "H341", "H350", "H350i", "H360", "H360D", "H360Df", "H360F", "H360FD", "H360Fd", "H361", "H361d", "H361df", "H362", "H370", "H371", "H372", "H373", "H300", "H301", "H310", "H311", "H330", "H331", "UEH001", "EUH006", "EUH019", "EUH029", "EUH031", "EUH32", "EUH044", "EUH070", "EUH071"]
+
+def baseline_statements(pageTexts):
+    return {statement for pageText in pageTexts for statement in baselineRedFlags if statement in pageText}
+
+# Every real code as it could appear on an MSDS page, the misspelled UEH001, EUH32 and H361df of the original list are not H-codes
+allCodes = sorted(set(redFlags) | cmrFilter | otherFilter)
+pageTemplates = ["{} Hazard statement", "Hazard statements\n{}: text", "({})", "H301 + {}", "{}®", "x{}x"]
+
+class RedFlagTest(unittest.TestCase):
+
+    def test_expected_statements(self):
+        cases = [
+            (["H361fd Suspected of damaging fertility"], ["H361fd"]),
+            (["H361f Suspected of damaging fertility"], ["H361f"]),
+            (["H350i May cause cancer by inhalation"], ["H350i"]),
+            (["H360Fd May damage fertility"], ["H360Fd"]),
+            (["H351 Suspected of causing cancer"], ["H351"]),
+            (["EUH001 Explosive when dry", "EUH032 Contact with acids"], ["EUH001", "EUH032"]),
+            (["H300 + H310 + H330 Fatal", "H372 Causes damage to organs"], ["H300", "H310", "H330", "H372"]),
+            (["H302 Harmful if swallowed", "Transport information"], []),
+        ]
+        for pageTexts, expected in cases:
+            with self.subTest(pageTexts=pageTexts):
+                self.assertEqual(extract_hazard_statements(pageTexts), expected)
+
+    def test_no_baseline_statement_lost(self):
+        # A statement found by the original script may only be missing if it is a prefix of a longer red flag found instead
+        for code in allCodes:
+            for template in pageTemplates:
+                pageTexts = [template.format(code)]
+                found = set(extract_hazard_statements(pageTexts))
+                for statement in baseline_statements(pageTexts) - found:
+                    with self.subTest(pageTexts=pageTexts, statement=statement):
+                        self.assertTrue(any(i != statement and i.startswith(statement) for i in found))
+
+    def test_red_flags_are_classified(self):
+        self.assertEqual(set(redFlags), cmrFilter | otherFilter)
+
+if __name__ == "__main__":
+    unittest.main()